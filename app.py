@@ -1,5 +1,13 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
 from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
 from datetime import datetime, timedelta, timezone
@@ -7,53 +15,59 @@ from dotenv import load_dotenv
 import os
 import secrets
 import hashlib
+import gzip
 import json
+import orjson
 import logging
+import queue
+import atexit
+import sqlite3
+from logging.handlers import QueueHandler, QueueListener
 
 # Load environment variables
 load_dotenv()
 
 import threading
-
-# Simple rate limiting (in-memory, resets on restart)
-from collections import defaultdict
 import time
-rate_limit_store = defaultdict(list)
-rate_limit_lock = threading.Lock()
-
-def is_rate_limited(ip, max_requests=10, window_seconds=60):
-    """Check if IP has exceeded rate limit"""
-    now = time.time()
-    with rate_limit_lock:
-        # Clean old entries
-        rate_limit_store[ip] = [t for t in rate_limit_store[ip] if now - t < window_seconds]
-        if len(rate_limit_store[ip]) >= max_requests:
-            return True
-        rate_limit_store[ip].append(now)
-        return False
 
 
 import re
 import unicodedata
 
+INVISIBLE_CHARS_RE = re.compile(r'[\u200b-\u200f\u2028-\u202f\u2060-\u206f\ufeff]')
+WHITESPACE_RE = re.compile(r'\s+')
+
 def sanitize_text(text):
     """Remove invisible/problematic unicode characters and normalize whitespace"""
     if not text:
         return ''
-    # Normalize unicode (NFKC converts weird chars to normal equivalents)
-    text = unicodedata.normalize('NFKC', text)
-    # Remove zero-width and invisible characters
-    text = re.sub(r'[\u200b-\u200f\u2028-\u202f\u2060-\u206f\ufeff]', '', text)
+    # Pure ASCII is already NFKC-normalized and has no invisible characters
+    if not text.isascii():
+        # Normalize unicode (NFKC converts weird chars to normal equivalents)
+        text = unicodedata.normalize('NFKC', text)
+        # Remove zero-width and invisible characters
+        text = INVISIBLE_CHARS_RE.sub('', text)
     # Normalize whitespace (multiple spaces, tabs, etc. to single space)
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE_RE.sub(' ', text)
     return text.strip()
 
 # Configuration from environment
 PENDING_TIMEOUT_MINUTES = int(os.getenv('PENDING_TIMEOUT_MINUTES', 30))
+EXPIRE_INTERVAL_SECONDS = int(os.getenv('EXPIRE_INTERVAL_SECONDS', 60))
 ADMIN_PHONE = os.getenv('ADMIN_PHONE', '6281234567890')
 ADMIN_PHONE_DISPLAY = os.getenv('ADMIN_PHONE_DISPLAY', '0812-3456-7890')
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider using orjson (C) for jsonify, request.get_json and the session cookie"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 # Configuration
@@ -64,26 +78,64 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'yarsi-hippocratic-oath-2026'
 DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL:
     app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    if not DATABASE_URL.startswith('sqlite'):
+        # Reuse connections across requests; pre-ping drops ones the server has closed
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        }
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'seats.db')
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Admin password from environment
-ADMIN_PASSWORD_HASH = hashlib.sha256(os.getenv('ADMIN_PASSWORD', 'test').encode()).hexdigest()
+# Cache configuration - SimpleCache is per-process, use RedisCache for multiple workers
+app.config['CACHE_TYPE'] = os.getenv('CACHE_TYPE', 'SimpleCache')
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+SEATS_CACHE_KEY = 'api_seats'
+SEATS_CACHE_TIMEOUT = 5  # seconds
+
+# Rate limit storage - memory:// is per-process, use redis:// to share limits across workers
+app.config['RATELIMIT_STORAGE_URI'] = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+
+# Admin password from environment (raw SHA-256 digest, compared in constant time)
+ADMIN_PASSWORD_DIGEST = hashlib.sha256(os.getenv('ADMIN_PASSWORD', 'test').encode()).digest()
 
 # Setup logging
+# Request threads only enqueue records; a background listener does the file/console I/O.
+# The QueueHandler formats each record, so the output handlers write the message as-is.
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(
+    log_queue,
+    logging.FileHandler(os.path.join(basedir, 'app.log')),
+    logging.StreamHandler()
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(basedir, 'app.log')),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 db = SQLAlchemy(app)
+cache = Cache(app)
+limiter = Limiter(get_remote_address, app=app)
+
+
+# SQLite fallback: WAL lets /api/seats reads proceed while a booking writes
+@db.event.listens_for(db.Engine, 'connect')
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
 
 
 # Error handlers
@@ -98,6 +150,18 @@ def internal_error(error):
     return render_template('errors/500.html'), 500
 
 
+@app.errorhandler(429)
+def rate_limit_error(error):
+    if request.endpoint == 'login':
+        return render_template('login.html', error='Terlalu banyak percobaan, coba lagi nanti'), 429
+    return jsonify({'error': 'Terlalu banyak permintaan, coba lagi nanti'}), 429
+
+
+def is_benchmark_request():
+    """Bypass rate limiting for benchmarking (requires BENCHMARK_MODE env var)"""
+    return request.headers.get('X-Benchmark-Bypass') == 'true' and os.environ.get('BENCHMARK_MODE') == 'true'
+
+
 # Auth decorator
 def login_required(f):
     @wraps(f)
@@ -124,11 +188,15 @@ class Transaction(db.Model):
     name = db.Column(db.String(100), nullable=False)  # Nama lengkap pemesan
     participant_name = db.Column(db.String(100), nullable=True)  # Nama peserta Baiat
     phone = db.Column(db.String(20), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     status = db.Column(db.String(20), default='pending')  # pending / active / revoked
     booked_by_admin = db.Column(db.Boolean, default=False)  # True if booked by admin
     wheelchair_count = db.Column(db.Integer, default=0)  # Number of wheelchairs needed
-    seats = db.relationship('Seat', backref='transaction', lazy=True)
+    # selectin: seats for every loaded transaction come from one extra SELECT (no N+1)
+    seats = db.relationship('Seat', backref='transaction', lazy='selectin')
+
+    # Covers status filters (prefix) and the status + timestamp sort in /booked and expiry
+    __table_args__ = (db.Index('ix_txn_status_ts', 'status', 'timestamp'),)
 
     def __repr__(self):
         return f'<Transaction {self.ticket_hash}>'
@@ -138,8 +206,9 @@ class Seat(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     region = db.Column(db.String(10), nullable=False)
     seat_number = db.Column(db.Integer, nullable=False)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True, index=True)
 
+    # unique_seat already backs (region, seat_number) lookups with an index
     __table_args__ = (db.UniqueConstraint('region', 'seat_number', name='unique_seat'),)
 
     def __repr__(self):
@@ -184,54 +253,98 @@ class AppSetting(db.Model):
         return setting
 
 
+def create_missing_indexes():
+    """Create model indexes missing from existing tables (db.create_all() skips tables that exist)"""
+    # Every gunicorn worker runs this at boot: IF NOT EXISTS, one transaction per index,
+    # and a lost race against another worker is logged instead of aborting the boot
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except DBAPIError as e:
+                logger.warning(f"Create index {index.name} skipped: {str(e)}")
+
+
+def seat_insert():
+    """INSERT for Seat with ON CONFLICT support (PostgreSQL or SQLite fallback)"""
+    if db.engine.dialect.name == 'postgresql':
+        return pg_insert(Seat)
+    return sqlite_insert(Seat)
+
+
 def expire_pending_tickets():
     """Auto-expire pending tickets older than PENDING_TIMEOUT_MINUTES"""
     try:
         cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=PENDING_TIMEOUT_MINUTES)
-        # Lock rows to prevent race conditions during expiration
-        expired = Transaction.query.filter(
-            Transaction.status == 'pending',
-            Transaction.timestamp < cutoff
-        ).with_for_update().all()
-        
-        for transaction in expired:
-            transaction.status = 'expired'
-            # Lock seats before freeing
-            for seat in Seat.query.filter_by(transaction_id=transaction.id).with_for_update().all():
-                seat.transaction_id = None
+        # Bulk UPDATE locks and flips the rows atomically, RETURNING gives the ids to free
+        expired_ids = db.session.execute(
+            db.update(Transaction)
+            .where(Transaction.status == 'pending', Transaction.timestamp < cutoff)
+            .values(status='expired')
+            .returning(Transaction.id)
+        ).scalars().all()
         
-        if expired:
+        if expired_ids:
+            db.session.execute(
+                db.update(Seat)
+                .where(Seat.transaction_id.in_(expired_ids))
+                .values(transaction_id=None)
+            )
             db.session.commit()
+            cache.delete(SEATS_CACHE_KEY)
+        # Nothing to commit otherwise, the session is closed when the app context ends
         
-        return len(expired)
+        return len(expired_ids)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Expire tickets error: {str(e)}")
         return 0
 
 
+def _expire_pending_loop():
+    while True:
+        # No request path expires tickets any more, so this thread must never die
+        try:
+            with app.app_context():
+                expire_pending_tickets()
+        except Exception:
+            logger.exception("Expire tickets loop error")
+        time.sleep(EXPIRE_INTERVAL_SECONDS)
+
+
+_expiry_thread = None
+_expiry_thread_lock = threading.Lock()
+
+def start_expiry_scheduler():
+    """Start background thread that expires pending tickets every EXPIRE_INTERVAL_SECONDS"""
+    global _expiry_thread
+    with _expiry_thread_lock:
+        if _expiry_thread is None:
+            _expiry_thread = threading.Thread(target=_expire_pending_loop, name='expire-pending', daemon=True)
+            _expiry_thread.start()
+    return _expiry_thread
+
+
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit('5 per minute', methods=['POST'])  # Rate limit login attempts per IP
 def login():
     if session.get('logged_in'):
         return redirect('/admin')
     
     error = None
     if request.method == 'POST':
-        # Rate limit login attempts (5 per minute per IP)
         client_ip = request.remote_addr
-        if is_rate_limited(client_ip + '_login', max_requests=5, window_seconds=60):
-            error = 'Terlalu banyak percobaan, coba lagi nanti'
+        panitia_name = request.form.get('panitia_name', '').strip() or 'Unknown'
+        password = request.form.get('password', '')
+        if secrets.compare_digest(hashlib.sha256(password.encode()).digest(), ADMIN_PASSWORD_DIGEST):
+            session['logged_in'] = True
+            session['panitia_name'] = panitia_name
+            logger.info(f"LOGIN: panitia={panitia_name}, ip={client_ip}")
+            return redirect('/admin')
         else:
-            panitia_name = request.form.get('panitia_name', '').strip() or 'Unknown'
-            password = request.form.get('password', '')
-            if hashlib.sha256(password.encode()).hexdigest() == ADMIN_PASSWORD_HASH:
-                session['logged_in'] = True
-                session['panitia_name'] = panitia_name
-                logger.info(f"LOGIN: panitia={panitia_name}, ip={client_ip}")
-                return redirect('/admin')
-            else:
-                logger.warning(f"LOGIN FAILED: panitia={panitia_name}, ip={client_ip}")
-                error = 'Password salah'
+            logger.warning(f"LOGIN FAILED: panitia={panitia_name}, ip={client_ip}")
+            error = 'Password salah'
     
     return render_template('login.html', error=error)
 
@@ -244,7 +357,8 @@ def logout():
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory(os.path.join(app.root_path, 'static', 'assets'), 'favicon.png', mimetype='image/png')
+    # Let browsers keep the icon for a day instead of requesting it on every tab
+    return send_from_directory(os.path.join(app.root_path, 'static', 'assets'), 'favicon.png', mimetype='image/png', max_age=86400)
 
 
 @app.route('/')
@@ -262,8 +376,6 @@ def index():
 @app.route('/booked')
 @login_required
 def booked_list():
-    expire_pending_tickets()  # Clean up expired pending tickets
-    
     # Pagination and filtering
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -282,7 +394,7 @@ def booked_list():
     
     # Build query with filters
     query = Transaction.query
-    
+
     if status_filter != 'all':
         query = query.filter(Transaction.status == status_filter)
     
@@ -325,7 +437,7 @@ def booked_list():
 @app.route('/qr')
 @login_required
 def qr_page():
-    site_url = request.url_root.rstrip('/') + '/book'
+    site_url = url_for('guest_booking', _external=True)
     return render_template('qr.html', site_url=site_url)
 
 
@@ -356,13 +468,32 @@ def ticket_page(ticket_hash):
 @app.route('/api/seats')
 def get_seats():
     """Get all booked seats (pending + active)"""
-    expire_pending_tickets()  # Clean up expired pending tickets
-    booked_seats = Seat.query.filter(Seat.transaction_id.isnot(None)).all()
-    result = []
-    for seat in booked_seats:
-        if seat.transaction and seat.transaction.status in ('active', 'pending'):
-            result.append({'region': seat.region, 'number': seat.seat_number, 'status': seat.transaction.status})
-    return jsonify(result)
+    # Cache the encoded payload (not the response) so each request can get its own 304
+    cached = cache.get(SEATS_CACHE_KEY)
+    if cached is None:
+        # Single JOIN instead of lazy-loading seat.transaction per row
+        booked_seats = db.session.query(Seat.region, Seat.seat_number, Transaction.status).join(
+            Transaction, Seat.transaction_id == Transaction.id
+        ).filter(Transaction.status.in_(('active', 'pending'))).order_by(
+            Seat.region, Seat.seat_number  # Stable order keeps the ETag stable across cache refills
+        ).all()
+        result = [{'region': region, 'number': number, 'status': status} for region, number, status in booked_seats]
+        payload = jsonify(result).get_data()
+        cached = (hashlib.md5(payload).hexdigest(), payload, gzip.compress(payload))
+        cache.set(SEATS_CACHE_KEY, cached, timeout=SEATS_CACHE_TIMEOUT)
+    
+    etag, payload, payload_gzip = cached
+    response = Response(mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] > 0:
+        response.set_data(payload_gzip)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag + '-gzip')
+    else:
+        response.set_data(payload)
+        response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route('/api/check-seats', methods=['POST'])
@@ -371,16 +502,19 @@ def check_seats():
     data = request.get_json()
     seats = data.get('seats', [])
     
-    unavailable = []
-    for seat_data in seats:
-        existing = Seat.query.filter_by(
-            region=seat_data['region'],
-            seat_number=seat_data['number']
-        ).first()
-        if existing and existing.transaction_id:
-            if existing.transaction.status in ('active', 'pending'):
-                unavailable.append(f"{seat_data['region']}-{seat_data['number']}")
-    
+    # Look up all requested seats in one query instead of one per seat
+    try:
+        keys = [(s['region'], int(s['number'])) for s in seats]
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Nomor kursi tidak valid'}), 400
+    booked = set(db.session.query(Seat.region, Seat.seat_number).join(
+        Transaction, Seat.transaction_id == Transaction.id
+    ).filter(
+        db.tuple_(Seat.region, Seat.seat_number).in_(keys),
+        Transaction.status.in_(('active', 'pending'))
+    ).all())
+    unavailable = [f"{region}-{number}" for region, number in keys if (region, number) in booked]
+
     if unavailable:
         return jsonify({
             'available': False,
@@ -391,6 +525,7 @@ def check_seats():
 
 
 @app.route('/api/book', methods=['POST'])
+@limiter.limit('10 per minute', exempt_when=is_benchmark_request)  # Rate limit bookings per IP
 def book_seats():
     """Book seats and create transaction"""
     is_admin = session.get('logged_in', False)
@@ -402,12 +537,7 @@ def book_seats():
         if not is_sales_open():
             return jsonify({'error': 'Pembelian tiket sedang ditutup'}), 403
     
-    # Rate limiting (10 requests per minute per IP)
-    # Bypass for benchmarking (requires BENCHMARK_MODE env var)
-    bypass = request.headers.get('X-Benchmark-Bypass') == 'true' and os.environ.get('BENCHMARK_MODE') == 'true'
     client_ip = request.remote_addr
-    if not bypass and is_rate_limited(client_ip, max_requests=10, window_seconds=60):
-        return jsonify({'error': 'Terlalu banyak permintaan, coba lagi nanti'}), 429
     
     data = request.get_json()
     if not data:
@@ -447,21 +577,13 @@ def book_seats():
             return jsonify({'error': 'Format kursi tidak valid'}), 400
         if not isinstance(seat_data.get('region'), str) or len(seat_data['region']) > 10:
             return jsonify({'error': 'Region tidak valid'}), 400
+        # Seat numbers come back from the DB as int, normalize so lookups match
+        try:
+            seat_data['number'] = int(seat_data['number'])
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Nomor kursi tidak valid'}), 400
     
     try:
-        # Check and book seats atomically with row-level locking
-        for seat_data in seats:
-            # Use FOR UPDATE to lock the row (PostgreSQL) or just check (SQLite)
-            existing = Seat.query.filter_by(
-                region=seat_data['region'],
-                seat_number=seat_data['number']
-            ).with_for_update().first()
-            
-            if existing and existing.transaction_id:
-                if existing.transaction.status in ('active', 'pending'):
-                    db.session.rollback()
-                    return jsonify({'error': f"Kursi {seat_data['region']}-{seat_data['number']} sudah dipesan"}), 400
-        
         # Create transaction - active if admin, pending if guest
         ticket_hash = secrets.token_hex(16)
         status = 'active' if is_admin else 'pending'
@@ -469,18 +591,30 @@ def book_seats():
         db.session.add(transaction)
         db.session.flush()  # Get transaction ID
         
-        # Book seats
-        for seat_data in seats:
-            seat = Seat.query.filter_by(
-                region=seat_data['region'],
-                seat_number=seat_data['number']
-            ).first()
-            if not seat:
-                seat = Seat(region=seat_data['region'], seat_number=seat_data['number'])
-                db.session.add(seat)
-            seat.transaction_id = transaction.id
+        # Claim all seats atomically in one upsert: new seats are inserted, existing rows
+        # are only taken over if free. The WHERE tests only the locked row itself
+        # (reject/revoke/expiry always clear transaction_id), so it sees concurrent claims.
+        # Sorted keys make overlapping bookings lock rows in the same order (no deadlock).
+        keys = sorted(set((s['region'], s['number']) for s in seats))
+        insert_stmt = seat_insert().values([
+            {'region': region, 'seat_number': number, 'transaction_id': transaction.id}
+            for region, number in keys
+        ])
+        claimed = set(db.session.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=['region', 'seat_number'],
+                set_={'transaction_id': insert_stmt.excluded.transaction_id},
+                where=Seat.transaction_id.is_(None)
+            ).returning(Seat.region, Seat.seat_number)
+        ).all())
+        
+        for region, number in keys:
+            if (region, number) not in claimed:
+                db.session.rollback()
+                return jsonify({'error': f"Kursi {region}-{number} sudah dipesan"}), 400
         
         db.session.commit()
+        cache.delete(SEATS_CACHE_KEY)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Booking error: {str(e)}")
@@ -497,26 +631,48 @@ def book_seats():
     return jsonify({
         'success': True,
         'ticket_hash': ticket_hash,
-        'ticket_url': f'/ticket/{ticket_hash}'
+        'ticket_url': url_for('ticket_page', ticket_hash=ticket_hash)
     })
 
 
+def update_transaction_status(transaction_id, status, from_status=None, free_seats=False):
+    """Set a transaction's status with bulk UPDATEs, optionally freeing its seats"""
+    stmt = db.update(Transaction).where(Transaction.id == transaction_id)
+    if from_status:
+        stmt = stmt.where(Transaction.status == from_status)
+    row = db.session.execute(
+        stmt.values(status=status).returning(Transaction.name, Transaction.ticket_hash)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        return None, None
+    
+    seats = [f"{region}-{number}" for region, number in db.session.query(Seat.region, Seat.seat_number).filter(
+        Seat.transaction_id == transaction_id
+    )]
+    if free_seats:
+        db.session.execute(
+            db.update(Seat).where(Seat.transaction_id == transaction_id).values(transaction_id=None)
+        )
+    
+    db.session.commit()
+    cache.delete(SEATS_CACHE_KEY)
+    return row, seats
+
+
 @app.route('/api/approve/<int:transaction_id>', methods=['POST'])
 @api_login_required
 def approve_transaction(transaction_id):
     """Approve a pending transaction"""
     try:
-        transaction = Transaction.query.get(transaction_id)
-        if not transaction:
-            return jsonify({'error': 'Transaction not found'}), 404
-        if transaction.status != 'pending':
+        row, seats = update_transaction_status(transaction_id, 'active', from_status='pending')
+        if row is None:
+            if db.session.get(Transaction, transaction_id) is None:
+                return jsonify({'error': 'Transaction not found'}), 404
             return jsonify({'error': 'Transaction is not pending'}), 400
-        transaction.status = 'active'
-        db.session.commit()
         
-        seats = [f"{s.region}-{s.seat_number}" for s in transaction.seats]
         panitia = session.get('panitia_name', 'Unknown')
-        logger.info(f"APPROVE: id={transaction_id}, name={transaction.name}, seats={seats}, hash={transaction.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
+        logger.info(f"APPROVE: id={transaction_id}, name={row.name}, seats={seats}, hash={row.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
@@ -529,19 +685,12 @@ def approve_transaction(transaction_id):
 def reject_transaction(transaction_id):
     """Reject a pending transaction and free seats"""
     try:
-        transaction = Transaction.query.get(transaction_id)
-        if not transaction:
+        row, seats = update_transaction_status(transaction_id, 'revoked', free_seats=True)
+        if row is None:
             return jsonify({'error': 'Transaction not found'}), 404
-        seats = [f"{s.region}-{s.seat_number}" for s in transaction.seats]
-        transaction.status = 'revoked'
-        
-        # Free the seats
-        for seat in transaction.seats:
-            seat.transaction_id = None
         
-        db.session.commit()
         panitia = session.get('panitia_name', 'Unknown')
-        logger.info(f"REJECT: id={transaction_id}, name={transaction.name}, seats={seats}, hash={transaction.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
+        logger.info(f"REJECT: id={transaction_id}, name={row.name}, seats={seats}, hash={row.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
@@ -554,19 +703,12 @@ def reject_transaction(transaction_id):
 def revoke_transaction(transaction_id):
     """Revoke an active transaction and free seats"""
     try:
-        transaction = Transaction.query.get(transaction_id)
-        if not transaction:
+        row, seats = update_transaction_status(transaction_id, 'revoked', free_seats=True)
+        if row is None:
             return jsonify({'error': 'Transaction not found'}), 404
-        seats = [f"{s.region}-{s.seat_number}" for s in transaction.seats]
-        transaction.status = 'revoked'
-        
-        # Free the seats
-        for seat in transaction.seats:
-            seat.transaction_id = None
         
-        db.session.commit()
         panitia = session.get('panitia_name', 'Unknown')
-        logger.info(f"REVOKE: id={transaction_id}, name={transaction.name}, seats={seats}, hash={transaction.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
+        logger.info(f"REVOKE: id={transaction_id}, name={row.name}, seats={seats}, hash={row.ticket_hash}, by_panitia={panitia}, ip={request.remote_addr}")
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
@@ -724,21 +866,24 @@ def availability_page():
 @app.route('/api/availability')
 def get_availability():
     """Get all availability settings"""
-    availabilities = SeatAvailability.query.all()
+    # Select plain columns, no SeatAvailability objects are needed for serialization
+    availabilities = db.session.execute(
+        db.select(SeatAvailability.region, SeatAvailability.seat_number, SeatAvailability.is_available)
+    ).all()
     result = {
         'regions': {},  # region -> is_available (for whole region)
         'seats': {}     # region -> {seat_number -> is_available}
     }
     
-    for av in availabilities:
-        if av.seat_number is None:
+    for region, seat_number, is_available in availabilities:
+        if seat_number is None:
             # Region-level availability
-            result['regions'][av.region] = av.is_available
+            result['regions'][region] = is_available
         else:
             # Seat-level availability
-            if av.region not in result['seats']:
-                result['seats'][av.region] = {}
-            result['seats'][av.region][str(av.seat_number)] = av.is_available
+            if region not in result['seats']:
+                result['seats'][region] = {}
+            result['seats'][region][str(seat_number)] = is_available
     
     return jsonify(result)
 
@@ -814,14 +959,23 @@ def set_bulk_availability():
     if not region:
         return jsonify({'error': 'Region required'}), 400
     
+    # Seat numbers come back from the DB as int, normalize so the existing-row check matches
+    try:
+        seats = [int(seat_number) for seat_number in seats]
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Seat numbers must be integers'}), 400
+    
     try:
-        for seat_number in seats:
-            av = SeatAvailability.query.filter_by(region=region, seat_number=seat_number).first()
-            if av:
-                av.is_available = is_available
-            else:
-                av = SeatAvailability(region=region, seat_number=seat_number, is_available=is_available)
-                db.session.add(av)
+        # One UPDATE for existing rows, one multi-row INSERT for the rest
+        in_region = db.and_(SeatAvailability.region == region, SeatAvailability.seat_number.in_(seats))
+        db.session.execute(db.update(SeatAvailability).where(in_region).values(is_available=is_available))
+        existing = set(db.session.scalars(db.select(SeatAvailability.seat_number).where(in_region)))
+        to_insert = [
+            {'region': region, 'seat_number': seat_number, 'is_available': is_available}
+            for seat_number in dict.fromkeys(seats) if seat_number not in existing
+        ]
+        if to_insert:
+            db.session.execute(db.insert(SeatAvailability), to_insert)
         
         db.session.commit()
         panitia = session.get('panitia_name', 'Unknown')
@@ -836,4 +990,6 @@ def set_bulk_availability():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        create_missing_indexes()
+    start_expiry_scheduler()
     app.run(debug=True, threaded=True)
@@ -6,6 +6,7 @@ Each worker books 1 seat.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import concurrent.futures
 import time
 import random
@@ -16,7 +17,7 @@ WLA_SEATS = list(range(1, 81))
 
 def book_seat(args):
     """Book a single seat as a guest"""
-    seat_num, base_url, bypass_ratelimit = args
+    seat_num, base_url, bypass_ratelimit, session = args
     
     payload = {
         "name": f"Test User {seat_num}",
@@ -30,7 +31,7 @@ def book_seat(args):
     
     start = time.time()
     try:
-        response = requests.post(
+        response = session.post(
             f"{base_url}/api/book",
             json=payload,
             headers=headers,
@@ -93,6 +94,13 @@ def run_benchmark(base_url, num_workers=10, total_seats=80, bypass_ratelimit=Fal
         'times': []
     }
     
+    # One keep-alive connection pool and one thread pool shared by all batches
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=num_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+    
     start_time = time.time()
     
     # Process in batches of num_workers
@@ -102,31 +110,33 @@ def run_benchmark(base_url, num_workers=10, total_seats=80, bypass_ratelimit=Fal
         
         print(f"Batch {batch_num}: Booking seats {batch[0]}-{batch[-1]}...")
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-            args_list = [(seat, base_url, bypass_ratelimit) for seat in batch]
-            futures = executor.map(book_seat, args_list)
-            
-            for result in futures:
-                status = result['status']
-                if status == 'SUCCESS':
-                    results['success'] += 1
-                    results['times'].append(result['time'])
-                    print(f"  ✓ {result['seat']} - {result['time']:.3f}s - ticket: {result.get('ticket', '')}")
-                elif status == 'RATE_LIMITED':
-                    results['rate_limited'] += 1
-                    print(f"  ⏳ {result['seat']} - RATE LIMITED")
-                elif status == 'FAILED':
-                    results['failed'] += 1
-                    print(f"  ✗ {result['seat']} - {result.get('error', '')}")
-                else:
-                    results['error'] += 1
-                    print(f"  ! {result['seat']} - ERROR: {result.get('error', '')}")
+        futures = [executor.submit(book_seat, (seat, base_url, bypass_ratelimit, session)) for seat in batch]
+        
+        # Report each result as soon as it completes
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            status = result['status']
+            if status == 'SUCCESS':
+                results['success'] += 1
+                results['times'].append(result['time'])
+                print(f"  ✓ {result['seat']} - {result['time']:.3f}s - ticket: {result.get('ticket', '')}")
+            elif status == 'RATE_LIMITED':
+                results['rate_limited'] += 1
+                print(f"  ⏳ {result['seat']} - RATE LIMITED")
+            elif status == 'FAILED':
+                results['failed'] += 1
+                print(f"  ✗ {result['seat']} - {result.get('error', '')}")
+            else:
+                results['error'] += 1
+                print(f"  ! {result['seat']} - ERROR: {result.get('error', '')}")
         
         # Small delay between batches to avoid overwhelming
         if batch_start + num_workers < len(seats_to_book):
             time.sleep(0.5)
     
     total_time = time.time() - start_time
+    executor.shutdown()
+    session.close()
     
     # Summary
     print(f"\n{'='*60}")
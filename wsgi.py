@@ -1,9 +1,19 @@
 """WSGI entrypoint for production deployment"""
-from app import app, db
+from app import app, db, create_missing_indexes, start_expiry_scheduler
 
 # Create database tables on startup
 with app.app_context():
     db.create_all()
+    create_missing_indexes()
+
+# Expire stale pending tickets in the background instead of per request
+start_expiry_scheduler()
+
+# Don't stat() templates for changes on every render, and compile them all up front
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
 
 if __name__ == "__main__":
     app.run()